@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
+import concurrent.futures
+import io
 import re
 import sys
 import logging
 import os
-from collections import defaultdict
 
 logging.basicConfig(
     level=logging.INFO,
@@ -11,7 +12,126 @@ logging.basicConfig(
     stream=sys.stdout
 )
 
+# Python builtins and methods with a PHP counterpart; call arguments may hold one
+# level of nested parentheses
+_RE_BUILTINS = re.compile(
+    r'\b(len|open|int)\('
+    r'|(\w+)\.split\s*\(((?:[^()]|\([^()]*\))+)\)'
+    r'|(\w+)\.strip\s*\(\)'
+    r'|(\w+)\.append\s*\(((?:[^()]|\([^()]*\))+)\)'
+)
+_PHP_FUNCTIONS = {
+    'len': 'count(',
+    'open': 'fopen(',
+    'int': 'intval(',
+}
+
+def _php_builtin(m):
+    if m.group(1):
+        return _PHP_FUNCTIONS[m.group(1)]
+    if m.group(2):
+        return f'explode({_RE_BUILTINS.sub(_php_builtin, m.group(3))}, {m.group(2)})'
+    if m.group(4):
+        return f'trim({m.group(4)})'
+    return f'{m.group(5)}[] = {_RE_BUILTINS.sub(_php_builtin, m.group(6))}'
+
+_RE_IDENT = re.compile(r'\b([a-zA-Z_][a-zA-Z0-9_]*)\b')
+# Quoted string literal (group 1), a run of code, or an unterminated literal to end of line
+_RE_TOKEN = re.compile(r'("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')|[^"\']+|.+')
+# f-string pieces: {placeholder}, an unterminated trailing {placeholder, or literal text
+_RE_FSTR_PART = re.compile(r'\{([^}]*)\}|\{([^}]+)$|([^{]+)')
+# Python literals and operators; the spaces around operators are lookarounds so
+# "a and not b" rewrites both words
+_RE_KW = re.compile(r'\b(?:True|False|None)\b|(?<= )(?:and|or|not)(?= )')
+_KW_MAP = {
+    'True': 'true',
+    'False': 'false',
+    'None': 'null',
+    'and': '&&',
+    'or': '||',
+    'not': '!',
+}
+# Python keyword or identifier (group 1), rewritten in a single pass; keywords come
+# first so True/and/... are not taken as plain identifiers
+_RE_WORD = re.compile(_RE_KW.pattern + '|' + _RE_IDENT.pattern)
+# Leading literal word of a handler pattern, e.g. "while" in r'^while\s+(.+):$'
+_RE_PATTERN_KEYWORD = re.compile(r'\^([A-Za-z_]\w*)(?=\\s|\\\(|:|\$)')
+_match_line_keyword = re.compile(r'\w+').match
+
+_REPLACE_CACHE_SIZE = 4096
+
+_OPENERS = '([{'
+_CLOSERS = ')]}'
+
+def _split_top_level(text, sep):
+    # Split on sep only outside brackets and string literals
+    parts = []
+    depth = 0
+    quote = None
+    start = 0
+    i = 0
+    n = len(text)
+    while i < n:
+        char = text[i]
+        if quote:
+            if char == '\\':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char in _OPENERS:
+            depth += 1
+        elif char in _CLOSERS:
+            depth -= 1
+        elif char == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+        i += 1
+    parts.append(text[start:])
+    return parts
+
+class _HandlerMatch:
+    # Exposes one handler's groups out of the combined dispatch match
+    __slots__ = ('_m', '_offset', '_count')
+
+    def __init__(self, m, offset, count):
+        self._m = m
+        self._offset = offset
+        self._count = count
+
+    def group(self, n=0):
+        return self._m.group(self._offset + n)
+
+    def groups(self):
+        return self._m.groups()[self._offset:self._offset + self._count]
+
 class DSLConverter:
+    # Shared indent prefixes so emitting a line doesn't build a fresh padding string
+    _INDENTS = [' ' * i for i in range(257)]
+
+    __slots__ = (
+        'block_types',
+        'known_vars',
+        'known_constants',
+        'indent_stack',
+        'do_while_pending',
+        'switch_pending',
+        'case_pending',
+        'php_out',
+        '_handlers',
+        '_dispatch',
+        'current_match_var',
+        'match_cases',
+        'in_function',
+        'in_anon_fn',
+        'with_vars',
+        'current_match_type',
+        'current_match_dest',
+        '_vars_version',
+        '_replace_cache',
+    )
+
     def __init__(self):
         self.block_types = []
         self.known_vars = set()
@@ -20,8 +140,8 @@ class DSLConverter:
         self.do_while_pending = False
         self.switch_pending = False
         self.case_pending = False
-        self.php_lines = []
-        self.block_handlers = defaultdict(list)
+        self.php_out = io.StringIO()
+        self._handlers = []
         self.current_match_var = None
         self.match_cases = []
         self.in_function = False
@@ -29,6 +149,8 @@ class DSLConverter:
         self.with_vars = {}
         self.current_match_type = None
         self.current_match_dest = None
+        self._vars_version = 0
+        self._replace_cache = {}
         self._register_handlers()
 
     def _register_handlers(self):
@@ -65,7 +187,42 @@ class DSLConverter:
             (r'^(\w+)\((.*)\)$', self._handle_function_call),
         ]
         for pattern, handler in handlers:
-            self.block_handlers[0].append((re.compile(pattern), handler))
+            self._handlers.append((re.compile(pattern), handler))
+
+        # Patterns anchored on a literal keyword can only match lines that start with
+        # that word, so each keyword gets its own alternation of just its patterns plus
+        # the keyword-less ones, kept in registration order
+        keywords = []
+        for pattern, _ in self._handlers:
+            m = _RE_PATTERN_KEYWORD.match(pattern.pattern)
+            keywords.append(m.group(1) if m else None)
+        self._dispatch = {'': self._fuse_handlers([i for i, kw in enumerate(keywords) if kw is None])}
+        for keyword in set(filter(None, keywords)):
+            indices = [i for i, kw in enumerate(keywords) if kw in (keyword, None)]
+            self._dispatch[keyword] = self._fuse_handlers(indices)
+
+    def _fuse_handlers(self, indices):
+        # One alternation per bucket so a line costs a single match; the outer
+        # named group of the winning branch is always m.lastindex, which indexes
+        # straight into the bucket's (handler, group count) tuple
+        combined = re.compile('|'.join(f'(?P<h{i}>{self._handlers[i][0].pattern})' for i in indices))
+        handlers_by_index = [None] * (combined.groups + 1)
+        for i in indices:
+            pattern, handler = self._handlers[i]
+            handlers_by_index[combined.groupindex[f'h{i}']] = (handler, pattern.groups)
+        return combined.match, tuple(handlers_by_index)
+
+    def _ind(self, n):
+        if 0 <= n <= 256:
+            return self._INDENTS[n]
+        return ' ' * n
+
+    def _emit(self, indent, text):
+        # Lines are newline-prefixed so the output has no trailing newline
+        write = self.php_out.write
+        write('\n')
+        write(self._ind(indent))
+        write(text)
 
     def _adjust_indent(self, indent):
         while self.indent_stack and indent < self.indent_stack[-1]:
@@ -82,22 +239,22 @@ class DSLConverter:
                 value = self.with_vars.get(level)
                 if value:
                     base_level, var_name = value
-                    self.php_lines.append(' ' * base_level + '} finally {')
-                    self.php_lines.append(' ' * (base_level + 4) + f'if (isset(${var_name}) && is_resource(${var_name})) {{')
-                    self.php_lines.append(' ' * (base_level + 8) + f'fclose(${var_name});')
-                    self.php_lines.append(' ' * (base_level + 4) + '}')
-                    self.php_lines.append(' ' * base_level + '}')
+                    self._emit(base_level, '} finally {')
+                    self._emit(base_level + 4, f'if (isset(${var_name}) && is_resource(${var_name})) {{')
+                    self._emit(base_level + 8, f'fclose(${var_name});')
+                    self._emit(base_level + 4, '}')
+                    self._emit(base_level, '}')
             elif block_type == 'anon_fn':
-                self.php_lines.append(' ' * level + '};')
+                self._emit(level, '};')
             elif self.case_pending:
-                self.php_lines.append(' ' * level + 'break;')
+                self._emit(level, 'break;')
                 self.case_pending = False
-                self.php_lines.append(' ' * level + '}')
+                self._emit(level, '}')
             elif self.switch_pending:
-                self.php_lines.append(' ' * level + '}')
+                self._emit(level, '}')
                 self.switch_pending = False
             else:
-                self.php_lines.append(' ' * level + '}')
+                self._emit(level, '}')
 
     def _convert_f_string(self, s):
         if s.startswith('f"'):
@@ -108,42 +265,50 @@ class DSLConverter:
             return s
         
         parts = []
-        current = []
-        in_placeholder = False
-        
-        for char in content:
-            if char == '{' and not in_placeholder:
-                in_placeholder = True
-                if current:
-                    parts.append('"' + ''.join(current).replace('"', '\\"') + '"')
-                    current = []
-            elif char == '}' and in_placeholder:
-                in_placeholder = False
-                var_expr = ''.join(current).strip()
-                var_expr = self._replace_vars(var_expr)
-                parts.append(var_expr)
-                current = []
+        for m in _RE_FSTR_PART.finditer(content):
+            if m.lastindex == 3:
+                parts.append('"' + m.group(3).replace('"', '\\"') + '"')
             else:
-                current.append(char)
-        
-        if current:
-            if in_placeholder:
-                var_expr = ''.join(current).strip()
-                var_expr = self._replace_vars(var_expr)
-                parts.append(var_expr)
-            else:
-                parts.append('"' + ''.join(current).replace('"', '\\"') + '"')
+                parts.append(self._replace_vars(m.group(m.lastindex).strip()))
         
         return ' . '.join(parts) if len(parts) > 1 else parts[0]
 
+    def _add_var(self, name):
+        if name not in self.known_vars:
+            self.known_vars.add(name)
+            self._bump_vars_version()
+
+    def _add_constant(self, name):
+        if name not in self.known_constants:
+            self.known_constants.add(name)
+            self._bump_vars_version()
+
+    def _bump_vars_version(self):
+        # Cached _replace_vars results depend on the known identifiers
+        self._vars_version += 1
+        self._replace_cache.clear()
+
+    def _php_word(self, m):
+        # Keywords are mapped; known variables get a $ prefix and constants and
+        # unknown identifiers stay as they are
+        name = m.group(1)
+        if name is None:
+            return _KW_MAP[m.group()]
+        if name in self.known_vars and name not in self.known_constants:
+            return '$' + name
+        return name
+
     def _replace_vars(self, expr):
+        php = self._replace_cache.get(expr)
+        if php is None:
+            if len(self._replace_cache) >= _REPLACE_CACHE_SIZE:
+                self._replace_cache.clear()
+            php = self._replace_cache[expr] = self._replace_vars_impl(expr)
+        return php
+
+    def _replace_vars_impl(self, expr):
         # Convert Python methods to PHP equivalents
-        expr = re.sub(r'(\w+)\.split\s*\(([^)]+)\)', r'explode(\2, \1)', expr)
-        expr = re.sub(r'(\w+)\.strip\s*\(\)', r'trim(\1)', expr)
-        expr = re.sub(r'(\w+)\.append\s*\(([^)]+)\)', r'\1[] = \2', expr)
-        expr = expr.replace('len(', 'count(')
-        expr = expr.replace('open(', 'fopen(')
-        expr = expr.replace('int(', 'intval(')
+        expr = _RE_BUILTINS.sub(_php_builtin, expr)
         
         # Handle f-strings
         if expr.startswith('f"') or expr.startswith("f'"):
@@ -152,52 +317,15 @@ class DSLConverter:
         # Handle regular string concatenation
         expr = expr.replace('..', '.')
         
-        # Split into string and non-string parts
-        parts = []
-        current = []
-        in_string = False
-        string_char = None
-        
-        for char in expr:
-            if char in ('"', "'") and (not in_string or string_char == char):
-                if in_string:
-                    current.append(char)
-                    parts.append(''.join(current))
-                    current = []
-                    in_string = False
-                    string_char = None
-                else:
-                    if current:
-                        parts.append(''.join(current))
-                        current = []
-                    current.append(char)
-                    in_string = True
-                    string_char = char
-            else:
-                current.append(char)
-        
-        if current:
-            parts.append(''.join(current))
-        
-        # Process non-string parts
+        # Walk string literals and code runs; only code runs get rewritten
         result = []
-        for part in parts:
-            if (part.startswith('"') and part.endswith('"')) or (part.startswith("'") and part.endswith("'")):
+        for tok in _RE_TOKEN.finditer(expr):
+            part = tok.group()
+            if tok.group(1) is not None:
                 result.append(part)
             else:
-                # Replace known variables
-                part = re.sub(r'\b([a-zA-Z_][a-zA-Z0-9_]*)\b', 
-                              lambda m: f'${m.group(1)}' if m.group(1) in self.known_vars and m.group(1) not in self.known_constants 
-                              else m.group(1) if m.group(1) in self.known_constants
-                              else m.group(0), 
-                              part)
-                # Replace Python keywords
-                part = part.replace('True', 'true')
-                part = part.replace('False', 'false')
-                part = part.replace('None', 'null')
-                part = part.replace(' and ', ' && ')
-                part = part.replace(' or ', ' || ')
-                part = part.replace(' not ', ' ! ')
+                # Replace known variables and Python keywords
+                part = _RE_WORD.sub(self._php_word, part)
                 result.append(part)
         
         return ''.join(result)
@@ -205,17 +333,16 @@ class DSLConverter:
     def _convert_value(self, value):
         v = value.strip()
         if v.startswith('[') and v.endswith(']'):
-            parts = [p.strip() for p in v[1:-1].split(',')]
-            return '[' + ', '.join(self._replace_vars(p) for p in parts) + ']'
+            parts = _split_top_level(v[1:-1], ',')
+            return '[' + ', '.join(self._convert_value(p) for p in parts) + ']'
         if v.startswith('{') and v.endswith('}'):
-            parts = [p.strip() for p in v[1:-1].split(',')]
             kv = []
-            for p in parts:
-                if ':' not in p: 
+            for p in _split_top_level(v[1:-1], ','):
+                k, *rest = _split_top_level(p, ':')
+                if not rest: 
                     continue
-                k, val = p.split(':', 1)
                 key = k.strip().strip('"').strip("'")
-                kv.append(f"'{key}' => {self._replace_vars(val.strip())}")
+                kv.append(f"'{key}' => {self._convert_value(':'.join(rest))}")
             return '[' + ', '.join(kv) + ']'
         low = v.lower()
         if low == 'true': 
@@ -230,9 +357,9 @@ class DSLConverter:
         filename = m.group(1)
         if filename.endswith('.ephp'):
             php_file = filename.replace('.ephp', '.php')
-            self.php_lines.append(' ' * indent + f'require_once "{php_file}";')
+            self._emit(indent, f'require_once "{php_file}";')
         else:
-            self.php_lines.append(' ' * indent + f'require_once "{filename}";')
+            self._emit(indent, f'require_once "{filename}";')
         return True
 
     def _handle_func(self, m, indent):
@@ -291,13 +418,13 @@ class DSLConverter:
                         arg_names.append(arg)
         
         ph_args = ', '.join(arg_parts)
-        self.php_lines.append(' ' * indent + f'function {name}({ph_args}): {php_return_type} {{')
+        self._emit(indent, f'function {name}({ph_args}): {php_return_type} {{')
         self.indent_stack.append(indent + 4)
         self.block_types.append('function')
         
         # Add function arguments to known variables
         for arg in arg_names:
-            self.known_vars.add(arg)
+            self._add_var(arg)
         return True
 
     def _handle_anon_fn_short(self, m, indent):
@@ -322,11 +449,11 @@ class DSLConverter:
         
         # Add arguments to known vars
         for arg in arg_names:
-            self.known_vars.add(arg)
+            self._add_var(arg)
             
         body = self._replace_vars(body)
-        self.php_lines.append(' ' * indent + f'${var_name} = fn({ph_args}) => {body};')
-        self.known_vars.add(var_name)
+        self._emit(indent, f'${var_name} = fn({ph_args}) => {body};')
+        self._add_var(var_name)
         return True
 
     def _handle_anon_fn_long(self, m, indent):
@@ -347,22 +474,22 @@ class DSLConverter:
         
         # Add arguments to known vars
         for arg in arg_names:
-            self.known_vars.add(arg)
+            self._add_var(arg)
             
-        self.php_lines.append(' ' * indent + f'${var_name} = function({ph_args}) {{')
+        self._emit(indent, f'${var_name} = function({ph_args}) {{')
         self.indent_stack.append(indent + 4)
         self.block_types.append('anon_fn')
-        self.known_vars.add(var_name)
+        self._add_var(var_name)
         return True
 
     def _handle_with(self, m, indent):
         expr, var_name = m.groups()
         php_expr = self._replace_vars(expr)
-        self.php_lines.append(' ' * indent + f'${var_name} = {php_expr};')
-        self.php_lines.append(' ' * indent + 'try {')
+        self._emit(indent, f'${var_name} = {php_expr};')
+        self._emit(indent, 'try {')
         self.indent_stack.append(indent + 4)
         self.block_types.append('with')
-        self.known_vars.add(var_name)
+        self._add_var(var_name)
         self.with_vars[indent + 4] = (indent, var_name)
         return True
 
@@ -372,7 +499,7 @@ class DSLConverter:
         self.current_match_type = 'assignment'
         self.current_match_var = match_var
         self.match_cases = []
-        self.known_vars.add(var_name)
+        self._add_var(var_name)
         return True
 
     def _handle_match_return(self, m, indent):
@@ -439,7 +566,8 @@ class DSLConverter:
                 php_lines.append('    ' + f'{values} => {case["result"]},')
         
         php_lines.append('};')
-        self.php_lines.extend([' ' * indent + line for line in php_lines])
+        for line in php_lines:
+            self._emit(indent, line)
         
         self.current_match_var = None
         self.match_cases = []
@@ -448,47 +576,47 @@ class DSLConverter:
     def _handle_input(self, m, indent):
         var, prompt = m.groups()
         prompt = prompt.strip().strip('"').strip("'")
-        self.php_lines.append(' ' * indent + f'${var} = readline("{prompt}");')
-        self.known_vars.add(var)
+        self._emit(indent, f'${var} = readline("{prompt}");')
+        self._add_var(var)
         return True
 
     def _handle_ternary(self, m, indent):
         var, tv, cond, fv = m.groups()
-        self.known_vars.add(var)
+        self._add_var(var)
         c = self._replace_vars(cond)
         t = self._replace_vars(tv)
         f = self._replace_vars(fv)
-        self.php_lines.append(' ' * indent + f'${var} = ({c}) ? {t} : {f};')
+        self._emit(indent, f'${var} = ({c}) ? {t} : {f};')
         return True
 
     def _handle_constant(self, m, indent):
         n, v = m.groups()
         php_v = self._replace_vars(v)
-        self.php_lines.append(' ' * indent + f'define("{n}", {php_v});')
-        self.known_constants.add(n)
+        self._emit(indent, f'define("{n}", {php_v});')
+        self._add_constant(n)
         return True
 
     def _handle_assignment(self, m, indent):
         var, val = m.groups()
-        self.known_vars.add(var)
+        self._add_var(var)
         php_v = self._convert_value(val)
-        self.php_lines.append(' ' * indent + f'${var} = {php_v};')
+        self._emit(indent, f'${var} = {php_v};')
         return True
 
     def _handle_return(self, m, indent):
-        self.php_lines.append(' ' * indent + f'return {self._replace_vars(m.group(1))};')
+        self._emit(indent, f'return {self._replace_vars(m.group(1))};')
         return True
 
     def _handle_break(self, m, indent):
-        self.php_lines.append(' ' * indent + 'break;')
+        self._emit(indent, 'break;')
         return True
 
     def _handle_continue(self, m, indent):
-        self.php_lines.append(' ' * indent + 'continue;')
+        self._emit(indent, 'continue;')
         return True
 
     def _handle_pass(self, m, indent):
-        self.php_lines.append(' ' * indent + '// pass')
+        self._emit(indent, '// pass')
         return True
 
     def _handle_print(self, m, indent):
@@ -496,25 +624,25 @@ class DSLConverter:
         # Handle array printing with implode
         if re.search(r'\$[a-zA-Z_][a-zA-Z0-9_]*$', content):
             content = f'implode(", ", {content})'
-        self.php_lines.append(' ' * indent + f'echo {self._replace_vars(content)};')
+        self._emit(indent, f'echo {self._replace_vars(content)};')
         return True
 
     def _handle_if(self, m, indent):
         cond = self._replace_vars(m.group(1))
-        self.php_lines.append(' ' * indent + f'if ({cond}) {{')
+        self._emit(indent, f'if ({cond}) {{')
         self.indent_stack.append(indent + 4)
         self.block_types.append('if')
         return True
 
     def _handle_elif(self, m, indent):
         cond = self._replace_vars(m.group(1))
-        self.php_lines.append(' ' * indent + f'elseif ({cond}) {{')
+        self._emit(indent, f'elseif ({cond}) {{')
         self.indent_stack.append(indent + 4)
         self.block_types.append('elif')
         return True
 
     def _handle_else(self, m, indent):
-        self.php_lines.append(' ' * indent + 'else {')
+        self._emit(indent, 'else {')
         self.indent_stack.append(indent + 4)
         self.block_types.append('else')
         return True
@@ -529,22 +657,22 @@ class DSLConverter:
         else:
             s, e, st = parts[:3]
         for_line = f"for (${var} = {self._replace_vars(s)}; ${var} < {self._replace_vars(e)}; ${var} += {self._replace_vars(st)}) {{"
-        self.php_lines.append(' ' * indent + for_line)
+        self._emit(indent, for_line)
         self.indent_stack.append(indent + 4)
         self.block_types.append('for')
-        self.known_vars.add(var)
+        self._add_var(var)
         return True
 
     def _handle_foreach(self, m, indent):
         var, coll = m.groups()
-        self.known_vars.add(var)
-        self.php_lines.append(' ' * indent + f'foreach ({self._replace_vars(coll)} as ${var}) {{')
+        self._add_var(var)
+        self._emit(indent, f'foreach ({self._replace_vars(coll)} as ${var}) {{')
         self.indent_stack.append(indent + 4)
         self.block_types.append('foreach')
         return True
 
     def _handle_do(self, m, indent):
-        self.php_lines.append(' ' * indent + 'do {')
+        self._emit(indent, 'do {')
         self.indent_stack.append(indent + 4)
         self.block_types.append('do')
         self.do_while_pending = True
@@ -556,16 +684,16 @@ class DSLConverter:
             if self.indent_stack:
                 lvl = self.indent_stack.pop()
                 block_type = self.block_types.pop() if self.block_types else None
-            self.php_lines.append(' ' * (lvl - 4) + f'}} while ({self._replace_vars(cond)});')
+            self._emit(lvl - 4, f'}} while ({self._replace_vars(cond)});')
             self.do_while_pending = False
         else:
-            self.php_lines.append(' ' * indent + f'while ({self._replace_vars(cond)}) {{')
+            self._emit(indent, f'while ({self._replace_vars(cond)}) {{')
             self.indent_stack.append(indent + 4)
             self.block_types.append('while')
         return True
 
     def _handle_switch(self, m, indent):
-        self.php_lines.append(' ' * indent + f'switch ({self._replace_vars(m.group(1))}) {{')
+        self._emit(indent, f'switch ({self._replace_vars(m.group(1))}) {{')
         self.indent_stack.append(indent + 4)
         self.block_types.append('switch')
         self.switch_pending = True
@@ -573,15 +701,15 @@ class DSLConverter:
 
     def _handle_switch_case(self, m, indent):
         if self.case_pending:
-            self.php_lines.append(' ' * (indent - 4) + 'break;')
-        self.php_lines.append(' ' * indent + f'case {self._replace_vars(m.group(1))}:')
+            self._emit(indent - 4, 'break;')
+        self._emit(indent, f'case {self._replace_vars(m.group(1))}:')
         self.case_pending = True
         return True
 
     def _handle_switch_default(self, m, indent):
         if self.case_pending:
-            self.php_lines.append(' ' * (indent - 4) + 'break;')
-        self.php_lines.append(' ' * indent + 'default:')
+            self._emit(indent - 4, 'break;')
+        self._emit(indent, 'default:')
         self.case_pending = True
         return True
 
@@ -590,11 +718,12 @@ class DSLConverter:
         # Special handling for PHP functions
         if fn == 'fwrite':
             args = re.sub(r'f"(.+?)"', r'"\1"', args)
-        self.php_lines.append(' ' * indent + f'{fn}({self._replace_vars(args)});')
+        self._emit(indent, f'{fn}({self._replace_vars(args)});')
         return True
 
     def convert(self, code):
-        self.php_lines = ['<?php', '// Generated by DSL to PHP converter']
+        self.php_out = io.StringIO()
+        self.php_out.write('<?php\n// Generated by DSL to PHP converter')
         self.indent_stack = [0]
         self.block_types = []
         self.do_while_pending = False
@@ -605,6 +734,7 @@ class DSLConverter:
         self.with_vars = {}
         self.known_vars = set()
         self.known_constants = set()
+        self._bump_vars_version()
         self.current_match_type = None
         self.current_match_dest = None
         
@@ -612,38 +742,45 @@ class DSLConverter:
         i = 0
         while i < len(lines):
             line = lines[i]
-            raw = line.rstrip()
-            indent = len(line) - len(line.lstrip())
+            stripped = line.lstrip()
+            # Tabs only count towards indentation; the rest of the line stays verbatim
+            indent = len(line[:len(line) - len(stripped)].expandtabs(4))
+            stripped = stripped.rstrip()
             
             # Skip empty lines
-            if not raw.strip():
-                self.php_lines.append('')
+            if not stripped:
+                self._emit(0, '')
                 i += 1
                 continue
                 
             # Handle comments
-            if raw.strip().startswith('#'):
-                comment = raw.strip()[1:].strip()
-                self.php_lines.append(' ' * indent + f'// {comment}')
+            if stripped[0] == '#':
+                comment = stripped[1:].strip()
+                self._emit(indent, f'// {comment}')
                 i += 1
                 continue
                 
-            self._adjust_indent(indent)
+            # Only a dedent can close blocks; the do/while pairing may leave the stack empty
+            indent_stack = self.indent_stack
+            if indent_stack and indent < indent_stack[-1]:
+                self._adjust_indent(indent)
             
+            kw = _match_line_keyword(stripped)
+            match, handlers_by_index = self._dispatch.get(kw.group() if kw else '', self._dispatch[''])
+            m = match(stripped)
             done = False
-            for pattern, handler in self.block_handlers[0]:
-                m = pattern.match(raw.strip())
-                if m:
-                    done = handler(m, indent)
-                    break
+            if m:
+                offset = m.lastindex
+                handler, count = handlers_by_index[offset]
+                done = handler(_HandlerMatch(m, offset, count), indent)
                     
             if not done:
-                if raw.strip().endswith(':'):
-                    self.php_lines.append(' ' * indent + raw.strip()[:-1] + ' {')
+                if stripped[-1] == ':':
+                    self._emit(indent, stripped[:-1] + ' {')
                     self.indent_stack.append(indent + 4)
                     self.block_types.append('block')
                 else:
-                    self.php_lines.append(' ' * indent + self._replace_vars(raw.strip()) + ';')
+                    self._emit(indent, self._replace_vars(stripped) + ';')
             
             i += 1
         
@@ -660,30 +797,39 @@ class DSLConverter:
                 self._finalize_match()
                 
             if block_type == 'do' and self.do_while_pending:
-                self.php_lines.append(' ' * (level - 4) + '} while (false);')
+                self._emit(level - 4, '} while (false);')
                 self.do_while_pending = False
             elif block_type == 'with':
                 value = self.with_vars.get(level)
                 if value:
                     base_level, var_name = value
-                    self.php_lines.append(' ' * base_level + '} finally {')
-                    self.php_lines.append(' ' * (base_level + 4) + f'if (isset(${var_name}) && is_resource(${var_name})) {{')
-                    self.php_lines.append(' ' * (base_level + 8) + f'fclose(${var_name});')
-                    self.php_lines.append(' ' * (base_level + 4) + '}')
-                    self.php_lines.append(' ' * base_level + '}')
+                    self._emit(base_level, '} finally {')
+                    self._emit(base_level + 4, f'if (isset(${var_name}) && is_resource(${var_name})) {{')
+                    self._emit(base_level + 8, f'fclose(${var_name});')
+                    self._emit(base_level + 4, '}')
+                    self._emit(base_level, '}')
             elif block_type == 'anon_fn':
-                self.php_lines.append(' ' * level + '};')
+                self._emit(level, '};')
             elif self.case_pending:
-                self.php_lines.append(' ' * level + 'break;')
+                self._emit(level, 'break;')
                 self.case_pending = False
-                self.php_lines.append(' ' * level + '}')
+                self._emit(level, '}')
             elif self.switch_pending:
-                self.php_lines.append(' ' * level + '}')
+                self._emit(level, '}')
                 self.switch_pending = False
             else:
-                self.php_lines.append(' ' * level + '}')
+                self._emit(level, '}')
+
+        return self.php_out.getvalue()
 
-        return "\n".join(self.php_lines)
+def _convert_import(import_path):
+    import_out = import_path.replace('.ephp', '.php')
+    converter = DSLConverter()
+    with open(import_path, 'r', encoding='utf-8') as f_import:
+        import_code = f_import.read()
+    php_code = converter.convert(import_code)
+    with open(import_out, 'w', encoding='utf-8') as f_out:
+        f_out.write(php_code)
 
 def main():
     if len(sys.argv) < 2:
@@ -701,6 +847,7 @@ def main():
         code = f.read()
         
     # Find all imports
+    import_paths = []
     for line in code.splitlines():
         if line.strip().startswith('import'):
             match = re.match(r'^import\s+"(.+\.ephp)"$', line.strip())
@@ -708,16 +855,19 @@ def main():
                 import_file = match.group(1)
                 import_path = os.path.join(base_dir, import_file)
                 if os.path.exists(import_path):
-                    print(f'Converting imported file: {import_path}')
-                    import_out = import_path.replace('.ephp', '.php')
-                    converter = DSLConverter()
-                    with open(import_path, 'r', encoding='utf-8') as f_import:
-                        import_code = f_import.read()
-                    php_code = converter.convert(import_code)
-                    with open(import_out, 'w', encoding='utf-8') as f_out:
-                        f_out.write(php_code)
+                    if import_path not in import_paths:
+                        print(f'Converting imported file: {import_path}')
+                        import_paths.append(import_path)
                 else:
                     print(f'Warning: Imported file not found: {import_path}')
+
+    # Imports are independent of each other, so spread them over worker processes
+    if len(import_paths) > 1:
+        with concurrent.futures.ProcessPoolExecutor() as executor:
+            list(executor.map(_convert_import, import_paths))
+    else:
+        for import_path in import_paths:
+            _convert_import(import_path)
     
     # Convert main file
     print(f'Converting main file: {inp}')